@@ -1,9 +1,15 @@
-import uuid
-from time import sleep, time
-from typing import Type, List
+import asyncio
+import json
+import os
+import secrets
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+from typing import Callable, Type, List, Optional
 
 from crewai.tools import BaseTool
-from kubernetes import client, config
+from kubernetes import client, config, watch
 from kubernetes.client.rest import ApiException
 from pydantic import BaseModel, Field
 
@@ -12,6 +18,230 @@ from pydantic import BaseModel, Field
 CONFIG_MAP_DATA_KEY = "script.py"
 CONTAINER_MOUNT_PATH = "/app"
 VOLUME_NAME = "code-volume"
+# Scripts up to this size are passed inline in the Job spec instead of a
+# ConfigMap. Kept below Linux's 128KiB limit for a single argv string.
+INLINE_SCRIPT_MAX_BYTES = 100_000
+INLINE_SCRIPT_PATH = "/tmp/script.py"
+# Writes an inline script (argv[1]) to INLINE_SCRIPT_PATH and execs python on
+# it, so __file__ and traceback source lines are the same as for a script file.
+INLINE_SCRIPT_BOOTSTRAP = (
+    "import os, sys; "
+    f"open({INLINE_SCRIPT_PATH!r}, 'w', encoding='utf-8').write(sys.argv[1]); "
+    f"os.execv(sys.executable, [sys.executable, '-u', {INLINE_SCRIPT_PATH!r}])"
+)
+# Only the last lines of a job's output are kept and returned.
+MAX_LOG_LINES = 10_000
+# Reads with this resourceVersion are served from the apiserver's watch cache
+WATCH_CACHE_RESOURCE_VERSION = "0"
+# How long to wait for a finished Job's pod to show up as finished too
+POD_SETTLE_SECONDS = 30
+# After this many watch failures in a row, waiting runs fail with the error
+INFORMER_MAX_ERRORS = 3
+# Informer watches are re-opened this often, resuming from the last event seen
+INFORMER_WATCH_SECONDS = 300
+# Concurrent jobs share one urllib3 pool; size it for parallel watches.
+CONNECTION_POOL_MAXSIZE = 32
+CLEANUP_WORKERS = 4
+WHEEL_VOLUME_NAME = "wheel-cache"
+WHEEL_MOUNT_PATH = "/wheels"
+# Every resource we create carries these labels so it can be selected server-side.
+MANAGED_BY_LABEL = "app.kubernetes.io/managed-by"
+MANAGED_BY = "code-runner"
+PREFIX_LABEL = "code-runner-prefix"
+# Images with these libraries already installed, so jobs can skip pip entirely,
+# e.g. {frozenset({"numpy", "pandas"}): "python_test:pandas"}. Empty by default
+# because jobs use image_pull_policy="Never": only list images built on the nodes.
+IMAGE_BY_LIBSET = {}
+# Requests let the scheduler bin-pack jobs; limits keep a runaway script contained.
+DEFAULT_CONTAINER_RESOURCES = client.V1ResourceRequirements(
+    requests={"cpu": "100m", "memory": "128Mi"},
+    limits={"cpu": "1", "memory": "512Mi"},
+)
+
+
+def _resource_labels(prefix: str) -> dict:
+    return {MANAGED_BY_LABEL: MANAGED_BY, PREFIX_LABEL: prefix}
+
+
+_CLEANUP_POOL = ThreadPoolExecutor(
+    max_workers=CLEANUP_WORKERS, thread_name_prefix="code-runner-cleanup"
+)
+
+
+def _set_future_result(future: asyncio.Future, obj):
+    if not future.done():
+        future.set_result(obj)
+
+
+def _set_future_exception(future: asyncio.Future, exc: BaseException):
+    if not future.done():
+        future.set_exception(exc)
+
+
+class ResourceInformer:
+    """Mirrors one kind of resource into memory from a single shared watch.
+
+    Every in-flight run waits on this cache instead of opening its own watch,
+    so the apiserver sees one watch per process however many jobs are running.
+    """
+
+    def __init__(
+        self,
+        list_func: Callable,
+        namespace: str,
+        label_selector: str,
+        key_func: Callable,
+    ):
+        self._list_func = list_func
+        self._namespace = namespace
+        self._label_selector = label_selector
+        self._key_func = key_func
+        self._store = {}
+        # key -> [(loop, future, predicate)] for runs waiting on that object
+        self._waiters = {}
+        # Set once the watch has failed INFORMER_MAX_ERRORS times in a row, and
+        # raised to waiters until the watch recovers
+        self._error = None
+        self._consecutive_errors = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="code-runner-informer", daemon=True
+        )
+        self._thread.start()
+
+    async def wait_for(self, key: str, predicate: Callable):
+        """Return the object stored under `key` once `predicate` holds for it."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future, predicate)
+        with self._lock:
+            if self._error is not None:
+                raise self._error
+            obj = self._store.get(key)
+            if obj is not None and predicate(obj):
+                return obj
+            self._waiters.setdefault(key, []).append(waiter)
+        try:
+            return await future
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(key, [])
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    self._waiters.pop(key, None)
+
+    def _run(self):
+        # List first, then watch from the list's resourceVersion. Any error
+        # relists, which replaces the store and so also drops objects deleted
+        # while the stream was down.
+        resource_version = None
+        while True:
+            w = watch.Watch()
+            try:
+                if resource_version is None:
+                    resource_version = self._relist()
+                for event in w.stream(
+                    self._list_func,
+                    namespace=self._namespace,
+                    label_selector=self._label_selector,
+                    resource_version=resource_version,
+                    timeout_seconds=INFORMER_WATCH_SECONDS,
+                ):
+                    obj = event["object"]
+                    resource_version = obj.metadata.resource_version
+                    self._handle(event["type"], obj)
+            except ApiException as e:
+                # 410 Gone: our resourceVersion is too old, relist
+                if e.status != 410:
+                    print(f"Informer watch error: {e.reason} (Status: {e.status})")
+                    self._record_error(e)
+                resource_version = None
+            except Exception as e:
+                # Dropped stream, apiserver unreachable, ...
+                print(f"Informer watch dropped: {e}")
+                self._record_error(e)
+                resource_version = None
+            else:
+                self._clear_error()
+            finally:
+                w.stop()
+
+    def _relist(self) -> str:
+        listing = self._list_func(
+            namespace=self._namespace,
+            label_selector=self._label_selector,
+            resource_version=WATCH_CACHE_RESOURCE_VERSION,
+        )
+        store = {}
+        for obj in listing.items:
+            key = self._key_func(obj)
+            if key is not None:
+                store[key] = obj
+        with self._lock:
+            self._store = store
+            ready = [
+                (waiter, obj)
+                for key, obj in store.items()
+                for waiter in self._waiters.get(key, [])
+                if waiter[2](obj)
+            ]
+        self._clear_error()
+        for (loop, future, _predicate), obj in ready:
+            try:
+                loop.call_soon_threadsafe(_set_future_result, future, obj)
+            except RuntimeError:
+                pass  # The waiting event loop has already closed
+        return listing.metadata.resource_version
+
+    def _record_error(self, exc: Exception):
+        with self._lock:
+            self._consecutive_errors += 1
+            if self._consecutive_errors < INFORMER_MAX_ERRORS:
+                failed = []
+            else:
+                # The watch keeps failing (e.g. 403 without list/watch rights):
+                # fail everyone waiting now instead of letting them time out
+                self._error = exc
+                failed = [
+                    waiter for waiters in self._waiters.values() for waiter in waiters
+                ]
+        for loop, future, _predicate in failed:
+            try:
+                loop.call_soon_threadsafe(_set_future_exception, future, exc)
+            except RuntimeError:
+                pass  # The waiting event loop has already closed
+        sleep(1)
+
+    def _clear_error(self):
+        with self._lock:
+            self._consecutive_errors = 0
+            self._error = None
+
+    def _handle(self, event_type: str, obj):
+        self._clear_error()
+        key = self._key_func(obj)
+        if key is None:
+            return
+        with self._lock:
+            if event_type == "DELETED":
+                self._store.pop(key, None)
+                return
+            self._store[key] = obj
+            ready = [waiter for waiter in self._waiters.get(key, []) if waiter[2](obj)]
+        for loop, future, _predicate in ready:
+            try:
+                loop.call_soon_threadsafe(_set_future_result, future, obj)
+            except RuntimeError:
+                pass  # The waiting event loop has already closed
+
+
+def _job_finished(job: client.V1Job) -> bool:
+    return bool(job.status and (job.status.succeeded or job.status.failed))
+
+
+def _pod_finished(pod: client.V1Pod) -> bool:
+    return bool(pod.status and pod.status.phase in ("Succeeded", "Failed"))
 
 
 class KubernetesCodeExecutor:
@@ -20,6 +250,9 @@ class KubernetesCodeExecutor:
         namespace: str = "default",
         image: str = "python_test",
         timeout_seconds: int = 300,
+        wheel_cache_claim: Optional[str] = None,
+        resources: Optional[client.V1ResourceRequirements] = None,
+        image_by_libset: Optional[dict] = None,
     ):
         try:
             # Load config from default location (~/.kube/config) or in-cluster config
@@ -31,137 +264,359 @@ class KubernetesCodeExecutor:
             # For in-cluster, use: config.load_incluster_config()
             raise
 
-        self.core_api = client.CoreV1Api()
-        self.batch_api = client.BatchV1Api()
+        configuration = client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = CONNECTION_POOL_MAXSIZE
+        # Both APIs share one ApiClient so they reuse the same warm connections
+        self.api_client = client.ApiClient(configuration=configuration)
+        self.core_api = client.CoreV1Api(self.api_client)
+        self.batch_api = client.BatchV1Api(self.api_client)
         self.namespace = namespace
         self.image = image
         self.timeout_seconds = timeout_seconds
+        # PVC holding prebuilt wheels, filled by prewarm_wheel_cache
+        self.wheel_cache_claim = wheel_cache_claim
+        self.resources = resources or DEFAULT_CONTAINER_RESOURCES
+        if image_by_libset is None:
+            image_by_libset = IMAGE_BY_LIBSET
+        # Lowercased like the requested libraries they are matched against
+        self.image_by_libset = {
+            frozenset(library.lower() for library in libset): image
+            for libset, image in image_by_libset.items()
+        }
+        # Started on the first run, see _start_informers
+        self._job_informer = None
+        self._pod_informer = None
+        self._informer_lock = threading.Lock()
 
-    def run(self, code_to_run: str, libraries_used, prefix: str = "code-runner") -> str:
-        job_id = str(uuid.uuid4())[:8]
+    async def run(
+        self, code_to_run: str, libraries_used, prefix: str = "code-runner"
+    ) -> str:
+        job_id = secrets.token_hex(4)
         job_name = f"{prefix}-job-{job_id}"
-        configmap_name = f"{prefix}-configmap-{job_id}"
+        if len(code_to_run.encode()) > INLINE_SCRIPT_MAX_BYTES:
+            configmap_name = f"{prefix}-configmap-{job_id}"
+        else:
+            configmap_name = None
 
+        self._start_informers()
         try:
-            # 1. Create ConfigMap with the user's code
-            self._create_configmap(configmap_name, code_to_run)
-
-            # 2. Create and run the Job
-            self._create_and_run_job(job_name, configmap_name, libraries_used)
+            # The kubernetes client is blocking, so every API call runs in a
+            # worker thread to keep the event loop free for other requests.
+            if configmap_name is None:
+                # 1. Create and run the Job with the user's code embedded in it
+                await asyncio.to_thread(
+                    self._create_and_run_job,
+                    job_name,
+                    configmap_name,
+                    libraries_used,
+                    prefix,
+                    code_to_run,
+                )
+            else:
+                # 1. Create the ConfigMap and the Job together; the Pod waits
+                # for the ConfigMap volume, so scheduling overlaps its creation
+                results = await asyncio.gather(
+                    asyncio.to_thread(
+                        self._create_configmap, configmap_name, code_to_run, prefix
+                    ),
+                    asyncio.to_thread(
+                        self._create_and_run_job,
+                        job_name,
+                        configmap_name,
+                        libraries_used,
+                        prefix,
+                    ),
+                    return_exceptions=True,
+                )
+                # Raise only once both creates have settled, or the cleanup
+                # below could delete the ConfigMap before it exists and leak it
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
 
-            # 3. Wait for the job to complete and get results
-            return self._wait_for_job_completion(job_name)
+            # 2. Wait for the job to complete and get results
+            return await self._wait_for_job_completion(job_name)
 
         except ApiException as e:
             print(f"Kubernetes API Error: {e.reason} (Status: {e.status})")
             # Re-raise or return a formatted error string
             return f"Error: A Kubernetes API error occurred. Status: {e.status}, Reason: {e.reason}"
         finally:
-            # 4. ALWAYS clean up resources to prevent leaks
+            # 3. ALWAYS clean up resources to prevent leaks. This happens in the
+            # background so the caller does not wait on the deletes;
+            # ttl_seconds_after_finished catches anything left behind.
             self._cleanup_resources(job_name, configmap_name)
 
-    def _create_configmap(self, name: str, code: str):
+    def _create_configmap(self, name: str, code: str, prefix: str):
         configmap = client.V1ConfigMap(
-            metadata=client.V1ObjectMeta(name=name), data={CONFIG_MAP_DATA_KEY: code}
+            metadata=client.V1ObjectMeta(name=name, labels=_resource_labels(prefix)),
+            data={CONFIG_MAP_DATA_KEY: code},
         )
         self.core_api.create_namespaced_config_map(
             namespace=self.namespace, body=configmap
         )
 
     def _create_and_run_job(
-        self, job_name: str, configmap_name: str, libraries_used: List[str]
+        self,
+        job_name: str,
+        configmap_name: Optional[str],
+        libraries_used: List[str],
+        prefix: str,
+        code: Optional[str] = None,
     ):
-        if len(libraries_used) > 0:
-            args = [
-                f"pip3 install --no-cache-dir --user {' '.join(libraries_used)} && python3",
-                "-u",
-                f"{CONTAINER_MOUNT_PATH}/{CONFIG_MAP_DATA_KEY}",
-            ]
+        volume_mounts = []
+        volumes = []
+        if configmap_name is None:
+            script_path = INLINE_SCRIPT_PATH
         else:
-            args = ["python3", "-u", f"{CONTAINER_MOUNT_PATH}/{CONFIG_MAP_DATA_KEY}"]
-        volume_mount = client.V1VolumeMount(
-            name=VOLUME_NAME,
-            mount_path=CONTAINER_MOUNT_PATH,
-        )
-        volume = client.V1Volume(
-            name=VOLUME_NAME,
-            config_map=client.V1ConfigMapVolumeSource(name=configmap_name),
-        )
+            script_path = f"{CONTAINER_MOUNT_PATH}/{CONFIG_MAP_DATA_KEY}"
+            volume_mounts.append(
+                client.V1VolumeMount(
+                    name=VOLUME_NAME,
+                    mount_path=CONTAINER_MOUNT_PATH,
+                )
+            )
+            volumes.append(
+                client.V1Volume(
+                    name=VOLUME_NAME,
+                    config_map=client.V1ConfigMapVolumeSource(name=configmap_name),
+                )
+            )
+
+        # A prebuilt image already has every library the script needs
+        image = self._image_for(libraries_used)
+        pip_install = None
+        if image is None and len(libraries_used) > 0:
+            libraries = " ".join(libraries_used)
+            pip_install = f"pip3 install --no-cache-dir --user {libraries}"
+            if self.wheel_cache_claim:
+                # Install from the shared wheel cache, only hitting PyPI on a miss
+                pip_install = (
+                    f"pip3 install --no-index --find-links={WHEEL_MOUNT_PATH} "
+                    f"--user {libraries} || {pip_install}"
+                )
+                volume_mounts.append(
+                    client.V1VolumeMount(
+                        name=WHEEL_VOLUME_NAME,
+                        mount_path=WHEEL_MOUNT_PATH,
+                        read_only=True,
+                    )
+                )
+                volumes.append(self._wheel_cache_volume(read_only=True))
+        if image is None:
+            image = self.image
+
+        if pip_install is None:
+            # Nothing to install, so run python directly without a shell
+            if configmap_name is None:
+                command = ["python3", "-c", INLINE_SCRIPT_BOOTSTRAP, code]
+            else:
+                command = ["python3", "-u", script_path]
+            args = None
+        else:
+            script = f"({pip_install}) && python3 -u {script_path}"
+            script_args = []
+            if configmap_name is None:
+                # The code arrives as $1 and is written out before anything runs
+                script = f'printf "%s" "$1" > {script_path} && {script}'
+                script_args = ["sh", code]
+            # sh is enough here, nothing in the script needs bash
+            command = ["sh", "-c"]
+            args = [script, *script_args]
+
         security_context = client.V1SecurityContext(
             run_as_user=1001, run_as_non_root=True
         )
 
         container = client.V1Container(
             name=job_name,
-            image=self.image,
+            image=image,
             image_pull_policy="Never",
-            command=["/bin/bash", "-c"],
+            command=command,
             args=args,
             security_context=security_context,
-            volume_mounts=[volume_mount],
+            volume_mounts=volume_mounts,
+            resources=self.resources,
         )
         pod_spec = client.V1PodSpec(
-            restart_policy="Never", containers=[container], volumes=[volume]
+            restart_policy="Never", containers=[container], volumes=volumes
         )
         template_spec = client.V1PodTemplateSpec(
-            metadata=client.V1ObjectMeta(labels={"app": job_name}), spec=pod_spec
+            metadata=client.V1ObjectMeta(
+                labels={"app": job_name, **_resource_labels(prefix)}
+            ),
+            spec=pod_spec,
         )
         job_spec = client.V1JobSpec(
             template=template_spec,
+            parallelism=1,
+            completions=1,
             backoff_limit=2,  # Fail faster
+            # Kubernetes kills the job itself once our own timeout has passed
+            active_deadline_seconds=self.timeout_seconds,
             ttl_seconds_after_finished=60,  # Auto-cleanup by Kubernetes if our script fails
         )
         job_body = client.V1Job(
             api_version="batch/v1",
             kind="Job",
-            metadata=client.V1ObjectMeta(name=job_name),
+            metadata=client.V1ObjectMeta(
+                name=job_name, labels=_resource_labels(prefix)
+            ),
             spec=job_spec,
         )
 
         self.batch_api.create_namespaced_job(body=job_body, namespace=self.namespace)
 
-    def _wait_for_job_completion(self, job_name: str) -> str:
-        start_time = time()
-        while time() - start_time < self.timeout_seconds:
-            try:
-                status = self.batch_api.read_namespaced_job_status(
-                    job_name, self.namespace
-                )
-                if status.status.succeeded:
-                    return self._get_pod_logs(job_name)
-                if status.status.failed:
-                    return f"Job failed. Logs:\n{self._get_pod_logs(job_name)}"
-            except ApiException as e:
-                # Can happen if the job is not yet fully registered
-                if e.status == 404:
-                    sleep(1)
-                    continue
-                raise  # Re-raise other API errors
-            sleep(2)  # Poll less aggressively
+    def _image_for(self, libraries_used: List[str]) -> Optional[str]:
+        # Pick a prebuilt image that already contains every requested library
+        wanted = frozenset(library.lower() for library in libraries_used)
+        if not wanted:
+            return None
+        for libset, image in self.image_by_libset.items():
+            if wanted <= libset:
+                return image
+        return None
 
-        raise TimeoutError(
-            f"Job '{job_name}' did not complete within {self.timeout_seconds} seconds."
+    def _wheel_cache_volume(self, read_only: bool) -> client.V1Volume:
+        return client.V1Volume(
+            name=WHEEL_VOLUME_NAME,
+            persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
+                claim_name=self.wheel_cache_claim, read_only=read_only
+            ),
         )
 
-    def _get_pod_logs(self, job_name: str) -> str:
+    def prewarm_wheel_cache(
+        self, libraries: List[str], prefix: str = "code-runner"
+    ) -> str:
+        """Build wheels for `libraries` into the shared cache used by jobs."""
+        if not self.wheel_cache_claim:
+            raise ValueError("No wheel_cache_claim configured for this executor.")
+
+        job_name = f"{prefix}-prewarm-{secrets.token_hex(4)}"
+        container = client.V1Container(
+            name=job_name,
+            image=self.image,
+            image_pull_policy="Never",
+            command=["/bin/bash", "-c"],
+            args=[f"pip3 wheel --wheel-dir={WHEEL_MOUNT_PATH} {' '.join(libraries)}"],
+            security_context=client.V1SecurityContext(
+                run_as_user=1001, run_as_non_root=True
+            ),
+            volume_mounts=[
+                client.V1VolumeMount(
+                    name=WHEEL_VOLUME_NAME, mount_path=WHEEL_MOUNT_PATH
+                )
+            ],
+        )
+        pod_spec = client.V1PodSpec(
+            restart_policy="Never",
+            containers=[container],
+            volumes=[self._wheel_cache_volume(read_only=False)],
+            # The kubelet hands the volume to group 1001, which the container
+            # joins, so pip can write to a PVC that is owned by root
+            security_context=client.V1PodSecurityContext(fs_group=1001),
+        )
+        job_body = client.V1Job(
+            api_version="batch/v1",
+            kind="Job",
+            metadata=client.V1ObjectMeta(
+                name=job_name, labels=_resource_labels(prefix)
+            ),
+            spec=client.V1JobSpec(
+                template=client.V1PodTemplateSpec(
+                    metadata=client.V1ObjectMeta(labels={"app": job_name}),
+                    spec=pod_spec,
+                ),
+                backoff_limit=2,
+                ttl_seconds_after_finished=60,
+            ),
+        )
+        self.batch_api.create_namespaced_job(body=job_body, namespace=self.namespace)
+        print(f"Prewarm job '{job_name}' created.")
+        return job_name
+
+    def _start_informers(self):
+        with self._informer_lock:
+            if self._job_informer is not None:
+                return
+            label_selector = f"{MANAGED_BY_LABEL}={MANAGED_BY}"
+            self._job_informer = ResourceInformer(
+                self.batch_api.list_namespaced_job,
+                self.namespace,
+                label_selector,
+                key_func=lambda job: job.metadata.name,
+            )
+            # Pods are keyed by the Job that created them
+            self._pod_informer = ResourceInformer(
+                self.core_api.list_namespaced_pod,
+                self.namespace,
+                label_selector,
+                key_func=lambda pod: (pod.metadata.labels or {}).get("job-name"),
+            )
+
+    async def _wait_for_job_completion(self, job_name: str) -> str:
+        try:
+            job = await asyncio.wait_for(
+                self._job_informer.wait_for(job_name, _job_finished),
+                self.timeout_seconds,
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"Job '{job_name}' did not complete within {self.timeout_seconds} seconds."
+            )
+
         try:
-            pod_list = self.core_api.list_namespaced_pod(
-                self.namespace, label_selector=f"job-name={job_name}"
+            # The pod normally finishes before its Job, so this rarely waits
+            pod = await asyncio.wait_for(
+                self._pod_informer.wait_for(job_name, _pod_finished),
+                POD_SETTLE_SECONDS,
             )
-            if not pod_list.items:
-                return "Could not find pod for the job. It might have been deleted or failed to start."
+            logs = await asyncio.to_thread(self._get_pod_logs, pod.metadata.name)
+        except asyncio.TimeoutError:
+            logs = "Could not find pod for the job. It might have been deleted or failed to start."
+        if job.status.succeeded:
+            return logs
+        return f"Job failed. Logs:\n{logs}"
 
-            pod_name = pod_list.items[0].metadata.name
-            return self.core_api.read_namespaced_pod_log(
-                pod_name, self.namespace
-            ).strip()
+    def _get_pod_logs(self, pod_name: str) -> str:
+        try:
+            # Stream the log line by line and keep only the tail, so memory per
+            # run is bounded no matter how much the script prints.
+            resp = self.core_api.read_namespaced_pod_log(
+                pod_name, self.namespace, follow=True, _preload_content=False
+            )
+            lines = deque(maxlen=MAX_LOG_LINES)
+            line_count = 0
+            try:
+                for line in resp:
+                    lines.append(line.decode("utf-8", errors="replace").rstrip("\n"))
+                    line_count += 1
+            finally:
+                resp.release_conn()
+            logs = "\n".join(lines).strip()
+            if line_count > MAX_LOG_LINES:
+                dropped = line_count - MAX_LOG_LINES
+                logs = f"[{dropped} earlier log lines truncated]\n{logs}"
+            return logs
         except ApiException as e:
             return f"Could not retrieve logs. Kubernetes API Error: {e.reason}"
 
-    def _cleanup_resources(self, job_name: str, configmap_name: str):
-        delete_options = client.V1DeleteOptions(propagation_policy="Foreground")
+    def _cleanup_resources(self, job_name: str, configmap_name: Optional[str]):
+        # Submitted straight to a dedicated pool and never awaited: nothing tied
+        # to the caller's event loop can cancel a delete still waiting in the
+        # queue when that loop shuts down (crewai runs tools via asyncio.run).
+        _CLEANUP_POOL.submit(self._delete_job, job_name)
+        # Delete ConfigMap, if the code did not fit inline in the Job
+        if configmap_name is not None:
+            _CLEANUP_POOL.submit(self._delete_configmap, configmap_name)
 
-        # Delete Job
+    def _delete_job(self, job_name: str):
+        # Logs are already read, so there is no need to wait for the Pod to be
+        # torn down: Background returns at once and lets the garbage collector
+        # remove the Pod, and a zero grace period skips graceful shutdown.
+        delete_options = client.V1DeleteOptions(
+            propagation_policy="Background", grace_period_seconds=0
+        )
         try:
             self.batch_api.delete_namespaced_job(
                 name=job_name, namespace=self.namespace, body=delete_options
@@ -170,7 +625,7 @@ class KubernetesCodeExecutor:
             if e.status != 404:  # Ignore if not found
                 print(f"Error deleting job '{job_name}': {e.reason}")
 
-        # Delete ConfigMap
+    def _delete_configmap(self, configmap_name: str):
         try:
             self.core_api.delete_namespaced_config_map(
                 name=configmap_name, namespace=self.namespace
@@ -181,28 +636,102 @@ class KubernetesCodeExecutor:
 
     def cleanup_all_by_prefix(self, prefix: str = "code-runner"):
         print(f"Starting cleanup of all resources with prefix '{prefix}'...")
+        # Filtering happens in the apiserver, and each kind is removed in a
+        # single call instead of one delete per object.
+        label_selector = f"{PREFIX_LABEL}={prefix}"
         # Cleanup Jobs
-        jobs = self.batch_api.list_namespaced_job(namespace=self.namespace)
-        for job in jobs.items:
-            if job.metadata.name.startswith(prefix):
-                self._cleanup_resources(
-                    job.metadata.name, "dummy-cm"
-                )  # Only need job name here
+        try:
+            self.batch_api.delete_collection_namespaced_job(
+                namespace=self.namespace,
+                label_selector=label_selector,
+                propagation_policy="Background",
+            )
+            print(f"Jobs with prefix '{prefix}' deleted.")
+        except ApiException as e:
+            print(f"Error deleting jobs with prefix '{prefix}': {e.reason}")
 
         # Cleanup ConfigMaps
-        configmaps = self.core_api.list_namespaced_config_map(namespace=self.namespace)
-        for cm in configmaps.items:
-            if cm.metadata.name.startswith(prefix):
-                try:
-                    self.core_api.delete_namespaced_config_map(
-                        name=cm.metadata.name, namespace=self.namespace
-                    )
-                    print(f"ConfigMap '{cm.metadata.name}' deleted.")
-                except ApiException as e:
-                    if e.status != 404:
-                        print(
-                            f"Error deleting configmap '{cm.metadata.name}': {e.reason}"
-                        )
+        try:
+            self.core_api.delete_collection_namespaced_config_map(
+                namespace=self.namespace, label_selector=label_selector
+            )
+            print(f"ConfigMaps with prefix '{prefix}' deleted.")
+        except ApiException as e:
+            print(f"Error deleting configmaps with prefix '{prefix}': {e.reason}")
+
+
+class QueueCodeExecutor:
+    """Runs code on long-lived worker Pods (code_worker.py) fed by a Redis stream.
+
+    Avoids paying Pod scheduling, image pull and pip install on every run.
+    """
+
+    def __init__(self, redis_url: str, timeout_seconds: int = 300):
+        import redis
+
+        self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.timeout_seconds = timeout_seconds
+
+    async def run(
+        self, code_to_run: str, libraries_used, prefix: str = "code-runner"
+    ) -> str:
+        import redis
+
+        job_id = f"{prefix}-{secrets.token_hex(4)}"
+        try:
+            return await asyncio.to_thread(
+                self._submit_and_wait, job_id, code_to_run, libraries_used
+            )
+        except redis.RedisError as e:
+            print(f"Redis Error: {e}")
+            return f"Error: A Redis error occurred. Reason: {e}"
+
+    def _submit_and_wait(
+        self, job_id: str, code_to_run: str, libraries_used: List[str]
+    ) -> str:
+        from code_worker import JOBS_STREAM, JOBS_STREAM_MAXLEN, reply_stream
+
+        reply = reply_stream(job_id)
+        self.redis.xadd(
+            JOBS_STREAM,
+            {"id": job_id, "code": code_to_run, "libs": json.dumps(libraries_used)},
+            maxlen=JOBS_STREAM_MAXLEN,
+            approximate=True,
+        )
+        try:
+            response = self.redis.xread(
+                {reply: 0}, count=1, block=self.timeout_seconds * 1000
+            )
+            if not response:
+                raise TimeoutError(
+                    f"Job '{job_id}' did not complete within {self.timeout_seconds} seconds."
+                )
+            _stream, messages = response[0]
+            _message_id, fields = messages[0]
+            return fields["output"]
+        finally:
+            self.redis.delete(reply)
+
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_executor():
+    # Loading kube config and opening connections is done once per process.
+    # Setting CODE_RUNNER_REDIS_URL sends work to the worker Pods instead of Jobs.
+    # Tools run in crew worker threads, so the lock keeps concurrent first
+    # calls from building two executors (and two sets of informer threads).
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                redis_url = os.environ.get("CODE_RUNNER_REDIS_URL")
+                if redis_url:
+                    _EXECUTOR = QueueCodeExecutor(redis_url)
+                else:
+                    _EXECUTOR = KubernetesCodeExecutor()
+    return _EXECUTOR
 
 
 # --- CrewAI Tool Definition ---
@@ -226,12 +755,12 @@ class KubernetesExecutionTool(BaseTool):
     )
     args_schema: Type[BaseModel] = KubernetesExecutionToolSchema
 
-    def _run(self, code: str, libraries_used: List) -> str:
-        # You can make the executor configurable here if needed
-        # e.g., executor = KubernetesCodeExecutor(image="my-custom-image-with-libs:latest")
-        executor = KubernetesCodeExecutor()
+    async def _run(self, code: str, libraries_used: List) -> str:
+        # You can make the executor configurable in _get_executor if needed
+        # e.g., KubernetesCodeExecutor(image="my-custom-image-with-libs:latest")
+        executor = _get_executor()
         try:
-            results = executor.run(code, libraries_used)
+            results = await executor.run(code, libraries_used)
             return {"answer": results, "code": code}
         except Exception as e:
             return f"An unexpected error occurred: {e}"
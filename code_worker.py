@@ -0,0 +1,192 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import List
+
+import redis
+
+# --- Constants ---
+# Shared with QueueCodeExecutor in KubernetesInterpreter.py.
+JOBS_STREAM = "code-runner:jobs"
+WORKER_GROUP = "code-runner-workers"
+REPLY_STREAM_PREFIX = "code-runner:reply:"
+REPLY_TTL_SECONDS = 600
+TIMEOUT_SECONDS = 300
+# Upper bound on queued jobs, in case no worker is consuming them
+JOBS_STREAM_MAXLEN = 10_000
+# Workers re-claim the job they are running this often. A job idle for longer
+# than CLAIM_IDLE_SECONDS belongs to a worker that died and is run again.
+HEARTBEAT_SECONDS = 10
+CLAIM_IDLE_SECONDS = 30
+# Tasks run as this unprivileged user. The worker itself starts as root, so a
+# task can neither read the worker's /proc/<pid>/environ (and with it the
+# Redis URL) nor signal or trace the worker.
+TASK_UID = 1001
+TASK_GID = 1001
+
+
+def reply_stream(job_id: str) -> str:
+    return f"{REPLY_STREAM_PREFIX}{job_id}"
+
+
+def _task_env(workdir: str, site_packages: str) -> dict:
+    # Scripts are untrusted: they get none of the worker's environment (such as
+    # CODE_RUNNER_REDIS_URL), and their home and temp dir are the task's own.
+    return {
+        "PATH": os.environ.get("PATH", os.defpath),
+        "HOME": workdir,
+        "TMPDIR": workdir,
+        "PYTHONPATH": site_packages,
+    }
+
+
+def _run_as_task_user(args: List[str], **kwargs) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        args, user=TASK_UID, group=TASK_GID, extra_groups=[], **kwargs
+    )
+
+
+def _kill_task_processes():
+    # Anything a task left running in the background (all of it runs as
+    # TASK_UID) is killed before the next task starts, so it cannot read that
+    # task's files. kill(-1) signals every process this user may signal.
+    _run_as_task_user(
+        [sys.executable, "-c", "import os, signal; os.kill(-1, signal.SIGKILL)"],
+        env={},
+    )
+
+
+def exec_in_subprocess(code: str, libraries_used: List[str]) -> str:
+    # One subprocess per task keeps scripts isolated from each other and from
+    # the worker loop; tasks in a Pod are run one at a time, never in parallel.
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chown(workdir, TASK_UID, TASK_GID)
+        try:
+            return _run_task(workdir, code, libraries_used)
+        finally:
+            # pip runs package build scripts, so this also covers a failed install
+            _kill_task_processes()
+
+
+def _run_task(workdir: str, code: str, libraries_used: List[str]) -> str:
+    # Libraries go into the task directory, so nothing a task installs is
+    # visible to later tasks
+    site_packages = os.path.join(workdir, "site-packages")
+    env = _task_env(workdir, site_packages)
+    if libraries_used:
+        pip = _run_as_task_user(
+            [
+                sys.executable,
+                "-m",
+                "pip",
+                "install",
+                "--no-cache-dir",
+                f"--target={site_packages}",
+                *libraries_used,
+            ],
+            cwd=workdir,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if pip.returncode != 0:
+            return f"Job failed. Logs:\n{(pip.stdout + pip.stderr).strip()}"
+
+    script_path = os.path.join(workdir, "script.py")
+    with open(script_path, "w") as f:
+        f.write(code)
+    os.chown(script_path, TASK_UID, TASK_GID)
+    try:
+        proc = _run_as_task_user(
+            [sys.executable, "-u", script_path],
+            cwd=workdir,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=TIMEOUT_SECONDS,
+        )
+    except subprocess.TimeoutExpired:
+        return f"Job did not complete within {TIMEOUT_SECONDS} seconds."
+
+    logs = (proc.stdout + proc.stderr).strip()
+    if proc.returncode != 0:
+        return f"Job failed. Logs:\n{logs}"
+    return logs
+
+
+@contextmanager
+def _heartbeat(r: redis.Redis, consumer: str, message_id: str):
+    # Claiming our own job again resets its idle time, so other workers can
+    # tell it is still being worked on
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                r.xclaim(
+                    JOBS_STREAM, WORKER_GROUP, consumer, 0, [message_id], justid=True
+                )
+            except redis.RedisError as e:
+                print(f"Heartbeat for job '{message_id}' failed: {e}")
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _next_jobs(r: redis.Redis, consumer: str) -> list:
+    # Jobs left pending by a crashed or rescheduled worker come first, then
+    # new ones. Consumers are named after the Pod, so a replacement Pod never
+    # sees its predecessor's pending jobs through XREADGROUP.
+    _next_id, claimed, *_deleted = r.xautoclaim(
+        JOBS_STREAM, WORKER_GROUP, consumer, CLAIM_IDLE_SECONDS * 1000, count=1
+    )
+    if claimed:
+        return claimed
+    response = r.xreadgroup(
+        WORKER_GROUP, consumer, {JOBS_STREAM: ">"}, count=1, block=5000
+    )
+    return [message for _stream, messages in response or [] for message in messages]
+
+
+def main():
+    if os.geteuid() != 0:
+        sys.exit(
+            "code_worker must start as root: it runs every task as "
+            f"uid {TASK_UID} so tasks cannot read its credentials."
+        )
+    r = redis.Redis.from_url(os.environ["CODE_RUNNER_REDIS_URL"], decode_responses=True)
+    consumer = socket.gethostname()
+    try:
+        r.xgroup_create(JOBS_STREAM, WORKER_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):  # Group already exists
+            raise
+
+    print(f"Worker '{consumer}' waiting for jobs on '{JOBS_STREAM}'...")
+    while True:
+        for message_id, fields in _next_jobs(r, consumer):
+            if message_id is None:
+                continue  # Deleted while pending
+            with _heartbeat(r, consumer, message_id):
+                output = exec_in_subprocess(fields["code"], json.loads(fields["libs"]))
+            reply = reply_stream(fields["id"])
+            r.xadd(reply, {"output": output})
+            r.expire(reply, REPLY_TTL_SECONDS)
+            # Acked entries stay in the stream until deleted; the job (and
+            # its code) is not needed anymore
+            r.xack(JOBS_STREAM, WORKER_GROUP, message_id)
+            r.xdel(JOBS_STREAM, message_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from semantic_flow import SemanticRoutingFlow
+
+from schemas import PythonSchema, GenericSchema
 
 app = FastAPI()
 app.add_middleware(
@@ -17,6 +18,8 @@ async def root():
     return {"response": "Hello World"}
 
 
+from typing import Optional, Union
+
 from pydantic import BaseModel
 
 
@@ -24,8 +27,14 @@ class Body(BaseModel):
     prompt: str
 
 
-@app.post("/query")
+# A typed response lets FastAPI serialize the model with pydantic directly
+# instead of going through jsonable_encoder
+@app.post("/query", response_model=Optional[Union[PythonSchema, GenericSchema]])
 async def query(body: Body):
+    # Imported here so the app starts (and serves "/") without loading crewai,
+    # semantic_router and kubernetes; the first query pays that cost once.
+    from semantic_flow import SemanticRoutingFlow
+
     flow = SemanticRoutingFlow()
     response = await flow.kickoff_async(inputs={"prompt": body.prompt})
     return response
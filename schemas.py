@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+
+
+class PythonSchema(BaseModel):
+
+    code: str = Field(..., description="Python3 code used to generate final answer.")
+    answer: str = Field(..., description="answer from executed python code")
+
+
+class GenericSchema(BaseModel):
+    answer: str = Field(..., description="answer from LLM")
@@ -1,10 +1,208 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
 from crewai.flow.flow import Flow, listen, start, router
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 from pydantic import BaseModel
-from crews import python_crew, generic_crew
-from semantic_router import Route
-from semantic_router.encoders import MistralEncoder
-from semantic_router.routers import SemanticRouter
+
+# semantic_router, the crews and everything they pull in (kubernetes, LLM
+# clients) are imported on first use so the app boots without paying for them.
+if TYPE_CHECKING:
+    from semantic_router.index.local import LocalIndex
+    from semantic_router.routers import SemanticRouter
+
+ROUTE_UTTERANCES = {
+    "coding": [
+        "What is the current stock price of apple?",
+        "How many r's are in strawberry?",
+        "what is 8^2",
+    ],
+    "generic": ["who was", "history of", "capital of"],
+}
+ENCODER_NAME = "mistral-embed"
+# Route embeddings are cached here so restarts do not re-embed every utterance
+ROUTER_INDEX_PATH = os.environ.get("ROUTER_INDEX_PATH", "router_index.npz")
+
+# Start both crews while the prompt is still being classified and keep the one
+# matching the route. Off by default: the losing crew is cancelled, but work it
+# already started in its worker thread (LLM calls, jobs) still runs and is paid for.
+SPECULATIVE_ROUTING = os.environ.get("SPECULATIVE_ROUTING", "").lower() in (
+    "1",
+    "true",
+)
+# Prompts arriving within BATCH_WAIT_SECONDS of each other share one embedding
+# request to Mistral, up to BATCH_MAX prompts per request.
+BATCH_MAX = 32
+BATCH_WAIT_SECONDS = 0.02
+
+
+_ROUTER = None
+_ROUTER_LOCK = threading.Lock()
+
+
+def _get_router() -> "SemanticRouter":
+    # Building the encoder and syncing the route index talks to Mistral, so do
+    # it once per process on first use rather than on every request. Callers
+    # come from worker threads, so concurrent cold starts wait on the lock
+    # instead of each building (and caching) their own router.
+    global _ROUTER
+    if _ROUTER is None:
+        with _ROUTER_LOCK:
+            if _ROUTER is None:
+                _ROUTER = _build_router()
+    return _ROUTER
+
+
+def _build_router() -> "SemanticRouter":
+    from semantic_router import Route
+    from semantic_router.encoders import MistralEncoder
+    from semantic_router.routers import SemanticRouter
+
+    routes = [
+        Route(name=name, utterances=utterances)
+        for name, utterances in ROUTE_UTTERANCES.items()
+    ]
+    encoder = MistralEncoder(
+        name=ENCODER_NAME,
+        score_threshold=0.4,
+    )
+    digest = _routes_digest()
+    index = _load_index(digest)
+    rl = SemanticRouter(encoder=encoder, routes=routes, index=index, auto_sync="local")
+    if index is None:
+        _save_index(rl.index, digest)
+    return rl
+
+
+def _routes_digest() -> str:
+    # Changes whenever an utterance or the embedding model changes
+    config = {
+        "encoder": ENCODER_NAME,
+        "routes": ROUTE_UTTERANCES,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def _load_index(digest: str) -> Optional["LocalIndex"]:
+    import numpy as np
+    from semantic_router.index.local import LocalIndex
+
+    if not os.path.exists(ROUTER_INDEX_PATH):
+        return None
+    try:
+        with np.load(ROUTER_INDEX_PATH) as cached:
+            if str(cached["digest"]) != digest:
+                return None
+            index = LocalIndex()
+            index.add(
+                embeddings=cached["embeddings"].tolist(),
+                routes=cached["routes"].tolist(),
+                utterances=cached["utterances"].tolist(),
+            )
+        # With dimensions set and the utterances already present, the router's
+        # local sync finds nothing to embed
+        index.dimensions = index.index.shape[1]
+    except Exception as e:
+        # A truncated or foreign file is just a cache miss; it gets rewritten
+        print(f"Ignoring unreadable router index at '{ROUTER_INDEX_PATH}': {e}")
+        return None
+    return index
+
+
+def _save_index(index: "LocalIndex", digest: str):
+    import numpy as np
+
+    # Write to a temp file and rename, so concurrently starting workers never
+    # read a half-written cache
+    tmp_path = f"{ROUTER_INDEX_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                digest=np.array(digest),
+                embeddings=index.index,
+                routes=index.routes,
+                utterances=index.utterances,
+            )
+        os.replace(tmp_path, ROUTER_INDEX_PATH)
+    except OSError as e:
+        print(f"Could not cache router index at '{ROUTER_INDEX_PATH}': {e}")
+
+
+def _embed(prompts: List[str]) -> List[List[float]]:
+    embeddings = _get_router().encoder(prompts)
+    if len(embeddings) != len(prompts):
+        raise ValueError(f"Expected {len(prompts)} embeddings, got {len(embeddings)}")
+    return embeddings
+
+
+class _EmbeddingBatcher:
+    """Collects prompts from concurrent requests and embeds them together."""
+
+    def __init__(self):
+        self._loop = None
+        self._queue = None
+        self._tasks = set()
+
+    async def submit(self, prompt: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Queues and tasks belong to one event loop; start fresh on a new one
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._spawn(self._collect())
+        future = loop.create_future()
+        self._queue.put_nowait((prompt, future))
+        return await future
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + BATCH_WAIT_SECONDS
+            while len(batch) < BATCH_MAX:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Embed in its own task so the next batch can start collecting now
+            self._spawn(self._embed_batch(batch))
+
+    async def _embed_batch(self, batch):
+        try:
+            embeddings = await asyncio.to_thread(_embed, [p for p, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # One rejected prompt (or a token limit across the whole batch)
+                # must not fail the others, so retry each prompt on its own
+                await asyncio.gather(*(self._embed_batch([item]) for item in batch))
+                return
+            _prompt, future = batch[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+        for (_prompt, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+
+_BATCHER = _EmbeddingBatcher()
+
+
+async def _classify(prompt: str):
+    embedding = await _BATCHER.submit(prompt)
+    return _get_router()(vector=embedding).name
 
 
 class SemanticState(BaseModel):
@@ -18,36 +216,53 @@ class SemanticRoutingFlow(Flow[SemanticState]):
         return {"prompt": self.state.prompt}
 
     @router(start_flow)
-    def classify_query(self):
-
-        coding_route = Route(
-            name="coding",
-            utterances=[
-                "What is the current stock price of apple?",
-                "How many r's are in strawberry?",
-                "what is 8^2",
-            ],
-        )
-        general_route = Route(
-            name="generic", utterances=["who was", "history of", "capital of"]
-        )
-        routes = [coding_route, general_route]
-        encoder = MistralEncoder(
-            name="mistral-embed",
-            score_threshold=0.4,
-        )
+    async def classify_query(self):
+        if not SPECULATIVE_ROUTING:
+            return await _classify(self.state.prompt)
 
-        rl = SemanticRouter(encoder=encoder, routes=routes, auto_sync="local")
+        from crews import make_python_crew, make_generic_crew
 
-        classification = rl(self.state.prompt).name
+        inputs = {"prompt": self.state.prompt}
+        crew_tasks = {
+            "coding": asyncio.create_task(
+                make_python_crew().kickoff_async(inputs=inputs)
+            ),
+            "generic": asyncio.create_task(
+                make_generic_crew().kickoff_async(inputs=inputs)
+            ),
+        }
+        try:
+            classification = await _classify(self.state.prompt)
+        except BaseException:
+            for task in crew_tasks.values():
+                task.cancel()
+            raise
+        for route, task in crew_tasks.items():
+            if route != classification:
+                task.cancel()
+        if classification in crew_tasks:
+            result = await crew_tasks[classification]
+            self.state.results[classification] = result.pydantic
         return classification
 
     @listen("coding")
-    def handle_coding_path(self):
-        result = python_crew.kickoff(inputs={"prompt": self.state.prompt})
+    async def handle_coding_path(self):
+        if "coding" in self.state.results:
+            return self.state.results["coding"]
+        from crews import make_python_crew
+
+        result = await make_python_crew().kickoff_async(
+            inputs={"prompt": self.state.prompt}
+        )
         return result.pydantic
 
     @listen("generic")
-    def handle_generic_path(self):
-        result = generic_crew.kickoff(inputs={"prompt": self.state.prompt})
+    async def handle_generic_path(self):
+        if "generic" in self.state.results:
+            return self.state.results["generic"]
+        from crews import make_generic_crew
+
+        result = await make_generic_crew().kickoff_async(
+            inputs={"prompt": self.state.prompt}
+        )
         return result.pydantic